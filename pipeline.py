@@ -1,4 +1,10 @@
+import sys
+from collections import deque
+
+
 class Instruction:
+    __slots__ = ('name', 'instr_str', 'stage_count')
+
     def __init__(self, name, instr_str):
         self.name = name
         self.instr_str = instr_str
@@ -6,11 +12,19 @@ class Instruction:
 
 
 class Pipeline:
+    # Pre-centered diagram cells, shared by every row of display_pipeline
+    _ACTIVE_CELL = "**".center(12)
+    _BLANK_CELL = " ".center(12)
+
     def __init__(self):
         #Step 0: Initialize all stages
-        self.instructions = []
+        self.instructions = deque()
         self.stages = ["IF", "ID", "EX", "WB"]
         self.i_number = 1
+        # step_pipeline messages are buffered and written once per step;
+        # with verbose off they are skipped entirely (e.g. for scripted runs)
+        self.log = []
+        self.verbose = True
 
     def add_instruction(self, instr_str):
         # Adding the instruction to the instruction queue (memory)
@@ -21,32 +35,33 @@ class Pipeline:
         print("-" * 80)
 
     def step_pipeline(self):
-        completed = []
+        next_fetch = None
 
-        # Step 1: Advance existing instructions (not in fetch)
+        # Step 1: Advance existing instructions (not in fetch). Instructions are
+        # fetched in queue order, so the first unfetched one ends the in-flight run
         for i in self.instructions:
-            if i.stage_count >= 0 and i.stage_count < 3:
-                i.stage_count += 1
-            elif i.stage_count == 3:
-                i.stage_count += 1
-                completed.append(i)
-
-        # Step 2: Try fetching a new instruction (if IF is free)
-        if not any(i.stage_count == 0 for i in self.instructions):
-            for i in self.instructions:
-                if i.stage_count == -1:
-                    i.stage_count = 0
-                    print(f"{i.name} fetched into IF stage.")
-                    break
-        else:
-            print("Structural Hazard: IF stage is already occupied. Fetch skipped.")
-
-        # Step 3: Clean up completed instructions
-        for i in completed:
-            print(f"{i.name} has completed execution.")
-            self.instructions.remove(i)
-
-        print("-" * 80)
+            if i.stage_count == -1:
+                next_fetch = i
+                break
+            i.stage_count += 1
+
+        # Step 2: Fetch the next instruction. Every in-flight instruction has just
+        # moved on, so IF is always free here and no structural hazard can occur
+        if next_fetch is not None:
+            next_fetch.stage_count = 0
+            if self.verbose:
+                self.log.append(f"{next_fetch.name} fetched into IF stage.")
+
+        # Step 3: Clean up completed instructions, which are always at the head
+        while self.instructions and self.instructions[0].stage_count == 4:
+            done = self.instructions.popleft()
+            if self.verbose:
+                self.log.append(f"{done.name} has completed execution.")
+
+        if self.verbose:
+            self.log.append("-" * 80)
+            sys.stdout.write("\n".join(self.log) + "\n")
+            self.log.clear()
 
     def display_pipeline(self):
         # Step 4: Display pipeline diagram
@@ -57,13 +72,10 @@ class Pipeline:
         print("-" * 80)
 
         for i in self.instructions:
-            row = f"{i.name} ({i.instr_str})".ljust(25)
-            for s in range(4):
-                if s == i.stage_count:
-                    row += "**".center(12)
-                else:
-                    row += " ".center(12)
-            print(row)
+            cells = [self._BLANK_CELL] * 4
+            if 0 <= i.stage_count < 4:
+                cells[i.stage_count] = self._ACTIVE_CELL
+            print(f"{i.name} ({i.instr_str})".ljust(25) + "".join(cells))
 
         if not self.instructions:
             print("Pipeline is empty. Please add instructions to get started.".center(80))
@@ -77,8 +89,9 @@ def main():
         print("1. Add Instruction")
         print("2. Step Pipeline")
         print("3. Display Pipeline")
-        print("4. Exit")
-        choice = input("Enter your choice (1-4): ")
+        print(f"4. Toggle Step Messages (currently {'on' if pipeline.verbose else 'off'})")
+        print("5. Exit")
+        choice = input("Enter your choice (1-5): ")
 
         if choice == '1':
             instr = input("Enter MIPS instruction (e.g., ADD $t0 $t1 $t2): ")
@@ -88,6 +101,9 @@ def main():
         elif choice == '3':
             pipeline.display_pipeline()
         elif choice == '4':
+            pipeline.verbose = not pipeline.verbose
+            print(f"Step messages turned {'on' if pipeline.verbose else 'off'}.")
+        elif choice == '5':
             print("Exiting program.")
             break
         else:
@@ -95,4 +111,5 @@ def main():
         print()
 
 
-main()
+if __name__ == '__main__':
+    main()
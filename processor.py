@@ -2,6 +2,31 @@
 # Supports R-type (add, sub, sll, slt, xor, or, nor, and, jr),
 # I-type (addi, lw, sw, beq, bne), and J-type (j, jal) instructions.
 
+import ctypes
+import struct
+import sys
+import weakref
+from array import array
+
+# MIPS addresses are mapped onto the simulated memory by keeping the low 21 bits
+ADDRESS_MASK = 0x001FFFFF
+
+# Big-endian unsigned 32-bit word codec, compiled once for all memory accesses
+_WORD = struct.Struct('>I')
+
+# A loop is compiled to straight-line Python once its back-edge has been taken
+# HOT_LOOP_THRESHOLD times; bodies longer than MAX_BLOCK_INSTRUCTIONS stay interpreted
+HOT_LOOP_THRESHOLD = 50
+MAX_BLOCK_INSTRUCTIONS = 64
+
+# run() executes straight-line code in traces of at most this many instructions
+MAX_TRACE_INSTRUCTIONS = 32
+
+# The decode memo keyed by instruction word is emptied once it holds this many
+# words, so code that keeps storing new instructions cannot grow it without bound
+MAX_DECODED_WORDS = 4096
+
+
 class RegisterFile:
     """
     Simulates 32 general-purpose MIPS registers.
@@ -23,7 +48,9 @@ class RegisterFile:
     $31 ($ra) - Return address
     """
     def __init__(self):
-        self.registers = [0] * 33  # 32 general registers + 1 for lo register
+        # 32 general registers + 1 for lo register, stored as unsigned 32-bit values.
+        # The CPU indexes this array directly; read()/write() are for other callers.
+        self.registers = array('I', [0] * 33)
 
     def read(self, index):
         """Read value from register at given index"""
@@ -35,6 +62,37 @@ class RegisterFile:
             return  # Register 0 is read-only and always zero
         self.registers[index] = value & 0xFFFFFFFF  # Simulate 32-bit overflow
 
+    def view(self):
+        """Return the backing array for fast indexed reads (treat it as read-only)"""
+        return self.registers
+
+    def snapshot(self):
+        """Return a copy of all register values (including lo) as a tuple"""
+        return tuple(self.registers)
+
+    def buffer_info(self):
+        """
+        Describe the raw register storage, like Memory.buffer_info().
+        
+        The 33 registers are contiguous native uint32 values, so native code
+        can read and write them in place. The array is never resized, so the
+        address stays valid for the lifetime of this RegisterFile.
+        
+        Returns:
+            A (address, length in bytes) tuple for the backing array
+        """
+        address, count = self.registers.buffer_info()
+        return (address, count * self.registers.itemsize)
+
+
+class CodeCache(dict):
+    """
+    A dict of decoded or compiled code that Memory.attach_code_cache() accepts.
+    Unlike a plain dict it can be weakly referenced, so attaching it does not
+    keep it (or the CPU that owns it) alive.
+    """
+    __slots__ = ('__weakref__',)
+
 
 class Memory:
     """
@@ -49,21 +107,73 @@ class Memory:
     """
     def __init__(self, size_bytes=2*1024*1024):  # 2MB of memory
         self.data = bytearray(size_bytes)
+        self._last_word = size_bytes - 4  # Highest internal address a word fits at
         self.base_address = 0  # Physical base address in the simulation
+        # Decoded-instruction caches to invalidate on stores, held weakly by id
+        self._code_caches = weakref.WeakValueDictionary()
+        self._code_words = set()  # Internal addresses of words held in those caches
+
+    def buffer_info(self):
+        """
+        Describe the raw memory buffer, like array.buffer_info().
         
-    def _translate_address(self, address):
+        Native code can use this to read and write simulated memory in place.
+        The buffer is never resized, so the address stays valid for the
+        lifetime of this Memory object. Writes made this way bypass the
+        code-cache tracking, so after overwriting instructions that may
+        already have run, call invalidate_code().
+        
+        Returns:
+            A (address, length in bytes) tuple for the backing bytearray
+        """
+        return (ctypes.addressof(ctypes.c_char.from_buffer(self.data)), len(self.data))
+
+    def reset(self):
+        """Zero all of memory in place and drop every cached decoded instruction."""
+        address, length = self.buffer_info()
+        ctypes.memset(address, 0, length)
+        self.invalidate_code()
+
+    def attach_code_cache(self, cache):
         """
-        Translate MIPS address to internal memory array index.
+        Register a decoded-instruction cache that must be kept coherent with memory.
+        The cache is cleared whenever a word recorded with mark_code() is written.
+        Memory only holds a weak reference, so the cache is detached
+        automatically once its owner drops it.
         
         Args:
-            address: The MIPS memory address to translate
-            
-        Returns:
-            The corresponding internal memory array index
+            cache: CodeCache of decoded instructions, keyed however its owner likes
+        """
+        self._code_caches[id(cache)] = cache
+
+    def detach_code_cache(self, cache):
         """
-        # For simplicity, we'll just mask off the upper bits to handle MIPS addresses
-        # MIPS addresses like 0x00400000 (text segment) need to be mapped to our memory array
-        return address & 0x001FFFFF  # Keep only lower 21 bits to map 0x00400000->0x00000000, etc.
+        Stop keeping a cache registered with attach_code_cache() coherent.
+        
+        Args:
+            cache: The CodeCache to detach
+        """
+        self._code_caches.pop(id(cache), None)
+
+    def mark_code(self, address):
+        """
+        Record that the word at a word-aligned address has been decoded and cached.
+        
+        Args:
+            address: The MIPS address of the instruction word
+        """
+        self._code_words.add(address & ADDRESS_MASK)
+
+    def invalidate_code(self):
+        """
+        Drop every cached decoded instruction after code has been overwritten.
+        
+        store_word() and the program loaders call this themselves; call it
+        after changing memory any other way, e.g. through buffer_info().
+        """
+        for cache in list(self._code_caches.values()):
+            cache.clear()
+        self._code_words.clear()
 
     def load_word(self, address):
         """
@@ -75,14 +185,36 @@ class Memory:
         Returns:
             The 32-bit word value at that address
         """
-        internal_addr = self._translate_address(address)
-        if internal_addr < 0 or internal_addr + 3 >= len(self.data):
+        # MIPS addresses like 0x00400000 (text segment) are mapped to our memory
+        # array by keeping only the lower 21 bits, so the index is never negative
+        internal_addr = address & ADDRESS_MASK
+        if internal_addr > self._last_word:
             raise IndexError(f"Memory access out of bounds: {address} -> {internal_addr}")
+
+        # MIPS is big-endian: the byte at the lowest address is the most significant.
+        # unpack_from reads straight out of the bytearray without copying a slice.
+        return _WORD.unpack_from(self.data, internal_addr)[0]
+
+    def fetch_word(self, address):
+        """
+        Load an instruction word for the CPU's fetch stage.
+        
+        Same result as load_word, minus the explicit bounds check. The program
+        counter is word-aligned in practice, so it only runs off the end of a
+        memory smaller than the address mask; unpack_from rejects that case,
+        which is reported as the same IndexError load_word raises.
+        
+        Args:
+            address: The program counter to fetch from
             
-        value = 0
-        for i in range(4):
-            value = (value << 8) | self.data[internal_addr + i]
-        return value
+        Returns:
+            The 32-bit instruction word at that address
+        """
+        try:
+            return _WORD.unpack_from(self.data, address & ADDRESS_MASK)[0]
+        except struct.error:
+            raise IndexError(f"Memory access out of bounds: {address} -> "
+                             f"{address & ADDRESS_MASK}") from None
 
     def store_word(self, address, value):
         """
@@ -92,14 +224,71 @@ class Memory:
             address: The memory address to store at
             value: The 32-bit word value to store
         """
-        internal_addr = self._translate_address(address)
-        if internal_addr < 0 or internal_addr + 3 >= len(self.data):
+        internal_addr = address & ADDRESS_MASK  # Same mapping as load_word
+        if internal_addr > self._last_word:
             raise IndexError(f"Memory access out of bounds: {address} -> {internal_addr}")
-            
-        # Extract each byte from the 32-bit value and store in memory
-        for i in range(4):
-            byte_val = (value >> (24 - (i * 8))) & 0xFF
-            self.data[internal_addr + i] = byte_val
+
+        # Write the word big-endian, directly into the bytearray with no temporary bytes
+        _WORD.pack_into(self.data, internal_addr, value & 0xFFFFFFFF)
+
+        # Self-modifying code: forget decoded instructions if a cached word was touched
+        code_words = self._code_words
+        if code_words and (internal_addr & ~3 in code_words
+                           or (internal_addr + 3) & ~3 in code_words):
+            self.invalidate_code()
+
+    def store_program(self, address, words):
+        """
+        Store a sequence of 32-bit words at consecutive addresses.
+        
+        The words are converted to a native uint32 array, byte-swapped to MIPS
+        big-endian order if needed, and copied into memory with one slice
+        assignment instead of one store_word per word. Passing an array('I')
+        skips the conversion from Python ints.
+        
+        Args:
+            address: The memory address of the first word
+            words: The 32-bit word values to store, in order (a sequence of
+                   ints or an array('I'))
+        """
+        try:
+            block = array('I', words)
+        except OverflowError:
+            # Values wider than 32 bits or negative: keep the low 32 bits like store_word
+            block = array('I', [w & 0xFFFFFFFF for w in words])
+        if sys.byteorder == 'little':
+            block.byteswap()
+        self.load_program_bytes(address, block)
+
+    def load_program_bytes(self, address, data):
+        """
+        Copy a program image into memory at consecutive addresses.
+        
+        The image is taken as is, so it must already be in MIPS big-endian
+        byte order, e.g. struct.pack('>7I', ...) or the bytes of a binary file.
+        It is copied with one slice assignment.
+        
+        Args:
+            address: The memory address of the first word
+            data: A bytes-like object whose length is a multiple of 4
+        """
+        data = memoryview(data).cast('B')
+        size = len(data)
+        if size % 4:
+            raise ValueError(f"Program image is not a whole number of words: {size} bytes")
+        start = address & ADDRESS_MASK
+        if start + size - 4 > self._last_word:
+            # Runs off the end of memory: let store_word wrap or raise per word
+            for (w,) in _WORD.iter_unpack(data):
+                self.store_word(address, w)
+                address += 4
+            return
+
+        self.data[start:start + size] = data
+
+        code_words = self._code_words
+        if code_words and not code_words.isdisjoint(range(start & ~3, start + size, 4)):
+            self.invalidate_code()
 
 
 class CPU:
@@ -111,15 +300,60 @@ class CPU:
     1. Fetch - Get the next instruction from memory
     2. Decode - Determine what operation to perform
     3. Execute - Perform the operation
+    
+    Execution engines:
+    'jit' - Interpret, and compile hot loops to straight-line Python (default)
+    'interpreter' - Interpret every instruction, never compile
     """
-    def __init__(self, memory):
+    ENGINES = ('jit', 'interpreter')
+
+    # Function codes of R-type instructions whose only effect is writing rd
+    # (add, sub, sll, slt, xor, or, nor, and, mflo); with rd = $zero they are no-ops
+    _RD_ONLY_FUNCTS = frozenset((0x20, 0x22, 0x00, 0x2A, 0x26, 0x25, 0x27, 0x24, 0x12))
+
+    def __init__(self, memory, engine='jit'):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {self.ENGINES}")
         self.memory = memory
+        self.engine = engine
         self.registers = RegisterFile()
         self.program_counter = 0x00400000  # MIPS text segment start
         # Initialize stack pointer ($sp = register 29)
         self.registers.write(29, 0x100000)
         # Initialize lo register for mult/div operations
         self.registers.write(32, 0)
+        # Dispatch tables: R-type keyed by function code, I/J-type by opcode
+        self._r_ops = {
+            0x20: self._op_add, 0x22: self._op_sub, 0x00: self._op_sll,
+            0x2A: self._op_slt, 0x26: self._op_xor, 0x25: self._op_or,
+            0x27: self._op_nor, 0x24: self._op_and, 0x08: self._op_jr,
+            0x18: self._op_mult, 0x1A: self._op_div, 0x12: self._op_mflo,
+        }
+        self._i_ops = {
+            0x08: self._op_addi, 0x23: self._op_lw, 0x2B: self._op_sw,
+            0x04: self._op_beq, 0x05: self._op_bne,
+        }
+        self._j_ops = {0x02: self._op_j, 0x03: self._op_jal}
+        # Handlers index the register array directly. $zero is restored after
+        # every instruction instead of guarding each write.
+        self._regs = self.registers.registers
+        # Pre-decoded (handler, operands) entries keyed by PC, so loops skip the
+        # fetch and decode steps after their first iteration
+        self._decoded_cache = CodeCache()
+        memory.attach_code_cache(self._decoded_cache)
+        # Decoded entries keyed by instruction word, shared by every PC holding
+        # that word. They do not depend on memory, so stores never invalidate them;
+        # decode() empties the table when it reaches MAX_DECODED_WORDS instead.
+        self._decoded_words = {}
+        # Decoded straight-line traces for run_many, keyed by start PC
+        self._traces = CodeCache()
+        memory.attach_code_cache(self._traces)
+        # Hot loops: back-edge counts and compiled blocks, keyed by loop start PC.
+        # A block of False marks a loop that cannot be compiled.
+        self._loop_hits = CodeCache()
+        self._blocks = CodeCache()
+        memory.attach_code_cache(self._loop_hits)
+        memory.attach_code_cache(self._blocks)
 
     def fetch(self):
         """
@@ -128,143 +362,248 @@ class CPU:
         Returns:
             The 32-bit instruction word
         """
-        instr = self.memory.load_word(self.program_counter)
+        instr = self.memory.fetch_word(self.program_counter)
         # self.program_counter += 4  # Move to next instruction
         return instr
 
-    def decode(self, instr):
+    def decode(self, instr, pc=None):
         """
-        Decode a 32-bit MIPS instruction.
+        Decode a 32-bit MIPS instruction into the handler that executes it.
+        
+        The opcode (or function code for R-type) selects a handler from the
+        dispatch tables built in __init__, so each instruction costs one dict
+        lookup instead of a walk down an if/elif chain.
+        Unknown opcodes and function codes decode to a no-op.
         
         Args:
             instr: The 32-bit instruction word
+            pc: The address the instruction was fetched from
+                (defaults to the current program counter)
             
         Returns:
-            A tuple representing the decoded instruction:
-            R-type: ('R', rs, rt, rd, shift, function)
-            I-type: ('I', opcode, rs, rt, immediate)
-            J-type: ('J', opcode, address)
+            A (handler, operands) pair for execute():
+            R-type: operands (rs, rt, rd, shift)
+            I-type: operands (rs, rt, immediate)
+            J-type: operands (target, return address)
+            For beq/bne the immediate is already converted to a byte offset
+            from the next instruction, so executing a branch is a single add.
+            Jump targets, PC[31:28] || address << 2, are fully computed here.
         """
+        # Apart from jumps, whose targets depend on the PC, the result depends
+        # only on the word, so each distinct word is split into fields just once
+        decoded_words = self._decoded_words
+        decoded = decoded_words.get(instr)
+        if decoded is None:
+            decoded = self._decode_fields(instr, pc)
+            if (instr >> 26) & 0x3F not in (2, 3):
+                if len(decoded_words) >= MAX_DECODED_WORDS:
+                    decoded_words.clear()
+                decoded_words[instr] = decoded
+        return decoded
+
+    def _decode_fields(self, instr, pc):
+        """Extract the fields of an instruction word; see decode()."""
         opcode = (instr >> 26) & 0x3F
+        # rs and rt sit in the same bits for R- and I-type, so extract them once
+        rs = (instr >> 21) & 0x1F
+        rt = (instr >> 16) & 0x1F
         if opcode == 0:
             # R-type format: opcode(6) rs(5) rt(5) rd(5) shamt(5) funct(6)
-            rs = (instr >> 21) & 0x1F
-            rt = (instr >> 16) & 0x1F
             rd = (instr >> 11) & 0x1F
             sh = (instr >> 6) & 0x1F
             fn = instr & 0x3F
-            return ('R', rs, rt, rd, sh, fn)
+            if rd == 0 and fn in self._RD_ONLY_FUNCTS:
+                return (self._op_nop, (rs, rt, rd, sh))
+            return (self._r_ops.get(fn, self._op_nop), (rs, rt, rd, sh))
         elif opcode in (2, 3):
             # J-type format: opcode(6) address(26)
-            addr = instr & 0x03FFFFFF
-            return ('J', opcode, addr)
+            if pc is None:
+                pc = self.program_counter
+            target = (pc & 0xF0000000) | ((instr & 0x03FFFFFF) << 2)
+            return (self._j_ops[opcode], (target, (pc + 4) & 0xFFFFFFFF))
         else:
             # I-type format: opcode(6) rs(5) rt(5) immediate(16)
-            rs = (instr >> 21) & 0x1F
-            rt = (instr >> 16) & 0x1F
             imm = instr & 0xFFFF
             # Sign extend the immediate value
             if imm & 0x8000:  # If the MSB is 1
                 imm = imm - 0x10000
-            return ('I', opcode, rs, rt, imm)
+            if opcode in (4, 5):
+                # Branch offsets are in words, relative to the branch itself;
+                # rebase them onto the already-incremented program counter
+                imm = (imm << 2) - 4
+            elif opcode == 0x08 and rt == 0:
+                # addi into $zero has no effect (lw into $zero still loads, as it can fault)
+                return (self._op_nop, (rs, rt, imm))
+            return (self._i_ops.get(opcode, self._op_nop), (rs, rt, imm))
+
+    def prime_decode_cache(self, start_pc, count):
+        """
+        Decode a run of instructions into the decoded-instruction cache up front,
+        so run() starts on cache hits instead of decoding on first execution.
+        
+        Args:
+            start_pc: Word-aligned address of the first instruction
+            count: Number of consecutive instructions to decode
+        """
+        if start_pc & 3:
+            raise ValueError(f"Instruction address must be word-aligned: {start_pc:#010x}")
+        cache = self._decoded_cache
+        for pc in range(start_pc, start_pc + 4 * count, 4):
+            cache[pc] = self.decode(self.memory.fetch_word(pc), pc)
+            self.memory.mark_code(pc)
+
+        # Peephole pass: a mult whose product is read straight back by mflo
+        # becomes one macro-op. The mflo keeps its own entry for branches into it.
+        for pc in range(start_pc, start_pc + 4 * (count - 1), 4):
+            (handler, operands), (next_handler, next_operands) = cache[pc], cache[pc + 4]
+            if handler == self._op_mult and next_handler == self._op_mflo:
+                cache[pc] = (self._op_mult_mflo, (operands[0], operands[1], next_operands[2]))
 
     def execute(self, decoded):
         """
-        Execute a decoded MIPS instruction.
+        Execute a decoded MIPS instruction at the current program counter.
+        
+        As in fetch/decode/execute stepping by hand, the caller advances the
+        program counter unless the instruction set it:
+            if not cpu.execute(cpu.decode(cpu.fetch())):
+                cpu.program_counter += 4
+        If the instruction faults, the program counter is left on it.
         
         Args:
-            decoded: The decoded instruction tuple from decode()
-        """
-        t = decoded[0]
-        pc_updated=False
-
-        # R-type instructions
-        if t == 'R':
-            _, rs, rt, rd, sh, fn = decoded
-            v1, v2 = self.registers.read(rs), self.registers.read(rt)
-            if fn == 0x20:  # add
-                self.registers.write(rd, v1 + v2)
-            elif fn == 0x22:  # sub
-                self.registers.write(rd, v1 - v2)
-            elif fn == 0x00:  # sll
-                self.registers.write(rd, v2 << sh)
-            elif fn == 0x2A:  # slt
-                self.registers.write(rd, 1 if v1 < v2 else 0)
-            elif fn == 0x26:  # xor
-                self.registers.write(rd, v1 ^ v2)
-            elif fn == 0x25:  # or
-                self.registers.write(rd, v1 | v2)
-            elif fn == 0x27:  # nor
-                self.registers.write(rd, ~(v1 | v2))
-            elif fn == 0x24:  # and
-                self.registers.write(rd, v1 & v2)
-            elif fn == 0x08:  # jr
-                self.program_counter = self.registers.read(rs)
-                pc_updated=True
-            elif fn == 0x18:  # mult
-                # In a real MIPS, this would set both hi and lo registers
-                product = v1 * v2
-                # For simplicity, we'll just set a pseudo lo register at index 32
-                self.registers.write(32, product & 0xFFFFFFFF)
-            elif fn == 0x1A:  # div
-                # In a real MIPS, this would set both hi and lo registers
-                if v2 != 0:  # Avoid division by zero
-                    quotient = v1 // v2
-                    self.registers.write(32, quotient & 0xFFFFFFFF)
-            elif fn == 0x12:  # mflo - move from lo
-                # For simplicity, we're using register 32 as the lo register
-                lo_val = self.registers.read(32)
-                self.registers.write(rd, lo_val)
-
-        # I-type instructions
-        elif t == 'I':
-            _, op, rs, rt, imm = decoded
-            # Get source register value
-            rs_val = self.registers.read(rs)
-            
-            if op == 0x08:  # addi
-                self.registers.write(rt, rs_val + imm)
-                
-            elif op == 0x23:  # lw
-                addr = rs_val + imm
-                self.registers.write(rt, self.memory.load_word(addr))
-                
-            elif op == 0x2B:  # sw
-                addr = rs_val + imm
-                rt_val = self.registers.read(rt)
-                self.memory.store_word(addr, rt_val)
-                
-            elif op == 0x04:  # beq
-                if self.registers.read(rs) == self.registers.read(rt):
-                    # Branch targets are relative to the next instruction
-                    # So we need to multiply by 4 to get byte offset
-                    pc_updated=True
-                    self.program_counter = self.program_counter + (imm * 4)
-                    
-            elif op == 0x05:  # bne
-                if self.registers.read(rs) != self.registers.read(rt):
-                    # Branch targets are relative to the next instruction
-                    # So we need to multiply by 4 to get byte offset
-                    pc_updated=True
-                    self.program_counter = self.program_counter + (imm * 4)
-
-        # J-type instructions
-        elif t == 'J':
-            _, op, addr = decoded
-            # Jump target calculation: PC[31:28] || target << 2
-            target = (self.program_counter & 0xF0000000) | (addr << 2)
+            decoded: The (handler, operands) pair from decode()
             
-            if op == 0x02:  # j
-                pc_updated=True
-                self.program_counter = target
-            elif op == 0x03:  # jal
-                # Save return address in $ra (r31)
-                self.registers.write(31, self.program_counter+4)
-                pc_updated=True
-                # Jump to target address
-                self.program_counter = target
+        Returns:
+            True if the instruction set the program counter (a jump or taken
+            branch), False if the caller should advance it
+        """
+        pc = self.program_counter
+        handler, operands = decoded
+        # Handlers expect the program counter to already point past them
+        self.program_counter = pc + 4
+        # Only jumps and taken branches return a value, even one that lands on pc + 4
+        pc_updated = handler(*operands) is not None
+        self._regs[0] = 0
+        if not pc_updated:
+            self.program_counter = pc
         return pc_updated
 
+    def _op_nop(self, *operands):
+        pass
+
+    # R-type handlers: (rs, rt, rd, shift)
+    # Registers hold unsigned 32-bit values, so results are masked to simulate overflow
+
+    def _op_add(self, rs, rt, rd, sh):
+        regs = self._regs
+        regs[rd] = (regs[rs] + regs[rt]) & 0xFFFFFFFF
+
+    def _op_sub(self, rs, rt, rd, sh):
+        regs = self._regs
+        regs[rd] = (regs[rs] - regs[rt]) & 0xFFFFFFFF
+
+    def _op_sll(self, rs, rt, rd, sh):
+        regs = self._regs
+        regs[rd] = (regs[rt] << sh) & 0xFFFFFFFF
+
+    def _op_slt(self, rs, rt, rd, sh):
+        regs = self._regs
+        regs[rd] = 1 if regs[rs] < regs[rt] else 0
+
+    def _op_xor(self, rs, rt, rd, sh):
+        regs = self._regs
+        regs[rd] = regs[rs] ^ regs[rt]
+
+    def _op_or(self, rs, rt, rd, sh):
+        regs = self._regs
+        regs[rd] = regs[rs] | regs[rt]
+
+    def _op_nor(self, rs, rt, rd, sh):
+        regs = self._regs
+        regs[rd] = ~(regs[rs] | regs[rt]) & 0xFFFFFFFF
+
+    def _op_and(self, rs, rt, rd, sh):
+        regs = self._regs
+        regs[rd] = regs[rs] & regs[rt]
+
+    def _op_jr(self, rs, rt, rd, sh):
+        self.program_counter = self._regs[rs]
+        return False  # Set the PC, but never a loop back-edge
+
+    def _op_mult(self, rs, rt, rd, sh):
+        # In a real MIPS, this would set both hi and lo registers
+        # For simplicity, we'll just set a pseudo lo register at index 32
+        regs = self._regs
+        regs[32] = (regs[rs] * regs[rt]) & 0xFFFFFFFF
+
+    def _op_div(self, rs, rt, rd, sh):
+        # In a real MIPS, this would set both hi and lo registers
+        regs = self._regs
+        v2 = regs[rt]
+        if v2 != 0:  # Avoid division by zero
+            regs[32] = regs[rs] // v2
+
+    def _op_mflo(self, rs, rt, rd, sh):
+        # For simplicity, we're using register 32 as the lo register
+        regs = self._regs
+        regs[rd] = regs[32]
+
+    def _op_mult_mflo(self, rs, rt, rd):
+        # Fused "mult rs, rt; mflo rd" from prime_decode_cache(); skips the mflo
+        regs = self._regs
+        regs[rd] = regs[32] = (regs[rs] * regs[rt]) & 0xFFFFFFFF
+        self.program_counter += 4
+
+    # I-type handlers: (rs, rt, immediate); branches get a pre-scaled byte offset
+
+    def _op_addi(self, rs, rt, imm):
+        regs = self._regs
+        regs[rt] = (regs[rs] + imm) & 0xFFFFFFFF
+
+    # A faulting load or store leaves the program counter on itself
+
+    def _op_lw(self, rs, rt, imm):
+        regs = self._regs
+        try:
+            regs[rt] = self.memory.load_word(regs[rs] + imm)
+        except IndexError:
+            self.program_counter -= 4
+            raise
+
+    def _op_sw(self, rs, rt, imm):
+        regs = self._regs
+        try:
+            self.memory.store_word(regs[rs] + imm, regs[rt])
+        except IndexError:
+            self.program_counter -= 4
+            raise
+
+    # Taken branches and jumps return a bool (untaken branches return None):
+    # True when they go backwards, which marks a loop back-edge for run()
+
+    def _op_beq(self, rs, rt, imm):
+        regs = self._regs
+        if regs[rs] == regs[rt]:
+            self.program_counter += imm
+            return imm < 0
+
+    def _op_bne(self, rs, rt, imm):
+        regs = self._regs
+        if regs[rs] != regs[rt]:
+            self.program_counter += imm
+            return imm < 0
+
+    # J-type handlers: (target, return address), both precomputed by decode()
+
+    def _op_j(self, target, link):
+        self.program_counter = target
+        return target < link
+
+    def _op_jal(self, target, link):
+        # Save return address in $ra (r31), then jump
+        self._regs[31] = link
+        self.program_counter = target
+        return False
+
     def run(self, cycles=1):
         """
         Run the CPU for the specified number of cycles.
@@ -272,12 +611,268 @@ class CPU:
         Args:
             cycles: Number of fetch-decode-execute cycles to run
         """
-        for _ in range(cycles):
-            instr = self.fetch()
-            dec = self.decode(instr)
-            pc_updated=self.execute(dec)
-            if not pc_updated:
-                self.program_counter+=4
+        self.run_many(cycles)
+
+    def run_many(self, cycles):
+        """
+        Execute a batch of cycles in one tight loop.
+        
+        Prefer one run_many(n) call over n calls to run(1): the loop's setup is
+        paid once per batch rather than once per instruction.
+        
+        Args:
+            cycles: Number of fetch-decode-execute cycles to run
+        """
+        # Execution goes a trace at a time: one lookup fetches the decoded
+        # instructions from the current PC up to the next branch, jump or store,
+        # which then run back to back. Everything the loop touches is bound to
+        # a local up front.
+        traces_get = self._traces.get
+        build_trace = self._build_trace
+        step = self.step
+        regs = self._regs
+        jit = self.engine == 'jit'
+        remaining = cycles
+        while remaining > 0:
+            pc = self.program_counter
+            trace = traces_get(pc)
+            if trace is None:
+                if pc & 3:  # Only word-aligned code is cached
+                    step()
+                    remaining -= 1
+                    continue
+                trace = build_trace(pc)
+            entries, length, last_pc = trace
+            if length > remaining:
+                # Not enough cycles left to run the whole trace
+                step()
+                remaining -= 1
+                continue
+            for next_pc, handler, operands in entries:
+                self.program_counter = next_pc
+                event = handler(*operands)
+                regs[0] = 0  # $zero is hardwired, discard any write to it
+            remaining -= length
+            # Only a trace's last instruction can branch, and only branches and
+            # jumps return anything: a true result marks a loop back-edge
+            if event and jit:
+                remaining -= self._run_hot_loop(last_pc, remaining)
+
+    def _build_trace(self, start_pc):
+        """
+        Decode and cache the straight-line run of instructions at a word-aligned start_pc.
+        
+        The trace ends after the first branch, jump or store (a store may
+        overwrite the code that follows it) or once it is MAX_TRACE_INSTRUCTIONS
+        long. Entries come from the decoded-instruction cache, so macro-ops
+        from prime_decode_cache() are kept.
+        
+        Args:
+            start_pc: Address of the first instruction
+            
+        Returns:
+            An (entries, length, last_pc) tuple: (next PC, handler, operands)
+            for each entry, the number of instructions it retires, and the
+            address of its last instruction
+        """
+        cache = self._decoded_cache
+        memory = self.memory
+        last_word = len(memory.data) - 4  # Stop before fetching past the end
+        ends = (self._op_beq, self._op_bne, self._op_j, self._op_jal, self._op_jr, self._op_sw)
+        entries = []
+        length = 0
+        pc = start_pc
+        while True:
+            entry = cache.get(pc)
+            if entry is None:
+                entry = cache[pc] = self.decode(memory.fetch_word(pc), pc)
+                memory.mark_code(pc)
+            handler, operands = entry
+            entries.append((pc + 4, handler, operands))
+            last_pc = pc
+            if handler == self._op_mult_mflo:
+                length += 2
+                pc += 8
+            else:
+                length += 1
+                pc += 4
+            if (handler in ends or length >= MAX_TRACE_INSTRUCTIONS
+                    or pc & ADDRESS_MASK > last_word):
+                break
+        trace = self._traces[start_pc] = (tuple(entries), length, last_pc)
+        return trace
+
+    def step(self):
+        """
+        Execute exactly one instruction, splitting macro-ops if needed.
+        """
+        pc = self.program_counter
+        entry = self._decoded_cache.get(pc)
+        if entry is None or entry[0] == self._op_mult_mflo:
+            entry = self.decode(self.memory.fetch_word(pc), pc)
+            if pc not in self._decoded_cache and not pc & 3:
+                self._decoded_cache[pc] = entry
+                self.memory.mark_code(pc)
+        if not self.execute(entry):
+            self.program_counter = pc + 4
+
+    def _run_hot_loop(self, branch_pc, budget):
+        """
+        Count a loop back-edge and run the loop's compiled block once it is hot.
+        
+        Args:
+            branch_pc: Address of the branch or jump that just looped back
+            budget: Number of cycles run() may still execute
+            
+        Returns:
+            The number of instructions the compiled block executed (0 if none)
+        """
+        start = self.program_counter
+        block = self._blocks.get(start)
+        if block is None:
+            hits = self._loop_hits.get(start, 0) + 1
+            self._loop_hits[start] = hits
+            if hits < HOT_LOOP_THRESHOLD:
+                return 0
+            block = self._blocks[start] = self._compile_block(start, branch_pc)
+        return block(budget) if block else 0
+
+    def jit_compile_block(self, start_pc, end_pc):
+        """
+        Compile a loop ahead of time instead of waiting for it to become hot.
+        
+        The block runs from the first time the back-edge at end_pc is taken.
+        It is dropped like any cached code if the loop is overwritten, and it
+        is only used by the 'jit' engine.
+        
+        Args:
+            start_pc: Address of the first instruction of the loop (the branch target)
+            end_pc: Address of the branch or jump that closes the loop
+        
+        Returns:
+            True if the loop was compiled, False if it has to stay interpreted
+            (end_pc is not a branch or jump back to start_pc, the body cannot
+            be compiled, or this CPU uses the 'interpreter' engine)
+        """
+        if self.engine != 'jit':
+            return False
+        block = self._compile_block(start_pc, end_pc)
+        if not block:
+            return False
+        self._blocks[start_pc] = block
+        return True
+
+    # Python source for each handler when it is inlined into a compiled block,
+    # with the name of the operand it writes (skipped when that is $zero)
+    _BLOCK_OPS = {
+        '_op_add': ("r[{rd}] = (r[{rs}] + r[{rt}]) & 0xFFFFFFFF", 'rd'),
+        '_op_sub': ("r[{rd}] = (r[{rs}] - r[{rt}]) & 0xFFFFFFFF", 'rd'),
+        '_op_sll': ("r[{rd}] = (r[{rt}] << {sh}) & 0xFFFFFFFF", 'rd'),
+        '_op_slt': ("r[{rd}] = 1 if r[{rs}] < r[{rt}] else 0", 'rd'),
+        '_op_xor': ("r[{rd}] = r[{rs}] ^ r[{rt}]", 'rd'),
+        '_op_or': ("r[{rd}] = r[{rs}] | r[{rt}]", 'rd'),
+        '_op_nor': ("r[{rd}] = ~(r[{rs}] | r[{rt}]) & 0xFFFFFFFF", 'rd'),
+        '_op_and': ("r[{rd}] = r[{rs}] & r[{rt}]", 'rd'),
+        '_op_mult': ("r[32] = (r[{rs}] * r[{rt}]) & 0xFFFFFFFF", None),
+        '_op_div': ("if r[{rt}]: r[32] = r[{rs}] // r[{rt}]", None),
+        '_op_mflo': ("r[{rd}] = r[32]", 'rd'),
+        '_op_addi': ("r[{rt}] = (r[{rs}] + {imm}) & 0xFFFFFFFF", 'rt'),
+        '_op_nop': ("pass", None),
+    }
+
+    def _compile_block(self, start, end):
+        """
+        Compile the loop from start to its back-edge at end into a Python function.
+        
+        The loop body becomes straight-line code on the register array, wrapped
+        in a while loop that keeps iterating as long as the back-edge is taken
+        and a whole iteration fits in the cycle budget. Branches inside the body
+        become side exits back to the interpreter.
+        Bodies containing jr or jal, or a jump before the back-edge, are not
+        compiled, and neither are ranges whose last instruction is not a
+        beq, bne or j back to start.
+        
+        Args:
+            start: Address of the first instruction of the loop (the branch target)
+            end: Address of the branch or jump that closes the loop
+            
+        Returns:
+            A function taking the cycle budget and returning the number of
+            instructions it executed, or False if the loop cannot be compiled
+        """
+        count = (end - start) // 4 + 1
+        if start & 3 or not 0 < count <= MAX_BLOCK_INSTRUCTIONS:
+            return False
+
+        body = []
+        for k in range(count):
+            pc = start + 4 * k
+            word = self.memory.fetch_word(pc)
+            self.memory.mark_code(pc)
+            handler, operands = self.decode(word, pc)
+            name = handler.__name__
+            last = k == count - 1
+            if last and name not in ('_op_beq', '_op_bne', '_op_j'):
+                return False  # Not a back-edge: the loop would have no way out
+
+            if name in ('_op_beq', '_op_bne'):
+                rs, rt, imm = operands
+                target = pc + 4 + imm
+                taken = '==' if name == '_op_beq' else '!='
+                if last:
+                    if target != start:
+                        return False
+                    # Falling through the back-edge leaves the loop
+                    not_taken = '!=' if name == '_op_beq' else '=='
+                    body.append(f"if r[{rs}] {not_taken} r[{rt}]:")
+                    body.append(f"    cpu.program_counter = {pc + 4}")
+                    body.append(f"    return executed + {count}")
+                else:
+                    body.append(f"if r[{rs}] {taken} r[{rt}]:")
+                    body.append(f"    cpu.program_counter = {target}")
+                    body.append(f"    return executed + {k + 1}")
+            elif name == '_op_j':
+                if not last or operands[0] != start:
+                    return False
+            elif name in ('_op_lw', '_op_sw'):
+                rs, rt, imm = operands
+                # Point the program counter at the access in case it raises
+                body.append(f"cpu.program_counter = {pc}")
+                if name == '_op_sw':
+                    body.append(f"store_word(r[{rs}] + {imm}, r[{rt}])")
+                    # A store into cached code flushes the caches; leave the block
+                    body.append("if not cache:")
+                    body.append(f"    cpu.program_counter = {pc + 4}")
+                    body.append(f"    return executed + {k + 1}")
+                elif rt:
+                    body.append(f"r[{rt}] = load_word(r[{rs}] + {imm})")
+                else:
+                    body.append(f"load_word(r[{rs}] + {imm})")
+            elif name in self._BLOCK_OPS:
+                template, dest = self._BLOCK_OPS[name]
+                fields = dict(zip(('rs', 'rt', 'rd', 'sh') if len(operands) == 4
+                                  else ('rs', 'rt', 'imm'), operands))
+                if dest is None or fields[dest]:
+                    body.append(template.format(**fields))
+            else:
+                return False
+
+        src = "\n".join([
+            "def block(budget):",
+            "    r = regs",
+            "    executed = 0",
+            f"    while executed + {count} <= budget:",
+            *("        " + line for line in body),
+            f"        executed += {count}",
+            f"    cpu.program_counter = {start}",
+            "    return executed",
+        ])
+        namespace = {
+            'cpu': self, 'regs': self._regs, 'cache': self._decoded_cache,
+            'load_word': self.memory.load_word, 'store_word': self.memory.store_word,
+        }
+        exec(compile(src, f"<block {start:#010x}>", 'exec'), namespace)
+        return namespace['block']
 
     def reset(self):
         """
@@ -285,11 +880,20 @@ class CPU:
         
         Args:
             CPU object - The current CPU object with which the simulator is running
+            
+        Returns:
+            The same CPU, reset in place
         """
-        cpu= CPU(Memory())
+        # Reuse the existing buffers instead of allocating a new CPU and 2MB Memory
+        address, length = self.registers.buffer_info()
+        ctypes.memset(address, 0, length)
+        self.memory.reset()  # Also drops the decoded and compiled code caches
+        self._decoded_words.clear()
+        self.program_counter = 0x00400000
+        self.registers.write(29, 0x100000)
         print("The simulator has been reset successfully.")
         print("New Session".center(80,'='))   
-        return cpu
+        return self
 
 
 def print_registers(reg_file):
@@ -307,9 +911,10 @@ def print_registers(reg_file):
         "$s0", "$s1", "$s2", "$s3", "$s4", "$s5", "$s6", "$s7",
         "$t8", "$t9", "$k0", "$k1", "$gp", "$sp", "$fp", "$ra"
     ]
-    for i, val in enumerate(reg_file.registers[:32]):
+    regs = reg_file.view()
+    for i, val in enumerate(regs[:32]):
         print(f"{reg_names[i]} (${i:02}): {val:#010x}")
-    print(f"lo: {reg_file.registers[32]:#010x}")
+    print(f"lo: {regs[32]:#010x}")
     print("======================\n")
 
 
@@ -402,19 +1007,13 @@ def main_menu():
                 if mode.lower()=="w": #Implementing write mode
                     cpu=cpu.reset()
                     data = input("Enter hex words separated by spaces: ")
-                    addr = 0x00400000
                     cpu.program_counter= 0x00400000 
-                    for w in data.split():
-                        cpu.memory.store_word(addr, int(w, 16))
-                        addr += 4
+                    cpu.memory.store_program(0x00400000, [int(w, 16) for w in data.split()])
                     print("Instructions loaded.")
                     break
                 elif mode.lower() == "a":  #Implementing append mode
                     data = input("Enter hex words separated by spaces: ")
-                    addr = cpu.program_counter
-                    for w in data.split():
-                        cpu.memory.store_word(addr, int(w, 16))
-                        addr += 4
+                    cpu.memory.store_program(cpu.program_counter, [int(w, 16) for w in data.split()])
                     print("Instructions loaded.")
                     break
                 else:
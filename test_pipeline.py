@@ -0,0 +1,110 @@
+# Tests for the pipeline visualiser: the text printed by add/step/display
+# sequences and by the menu must match the original simulator's output.
+# Run with: python -m unittest test_pipeline   (or pytest)
+
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import pipeline
+from pipeline import Pipeline
+
+RULE = "-" * 80
+CELL = " " * 12
+MARK = "     **     "
+HEADER = [
+    "",
+    " " * 32 + "PIPELINE DIAGRAM" + " " * 32,
+    RULE,
+    "Instruction              " + "     IF     " + "     ID     " + "     EX     " + "     WB     ",
+    RULE,
+]
+FOOTER = [RULE, ""]
+EMPTY = " " * 11 + "Pipeline is empty. Please add instructions to get started." + " " * 11
+
+
+def row(label, stage):
+    return label.ljust(25) + "".join(MARK if s == stage else CELL for s in range(4))
+
+
+def captured(action):
+    out = io.StringIO()
+    with redirect_stdout(out):
+        action()
+    return out.getvalue().split("\n")
+
+
+class PipelineTest(unittest.TestCase):
+    def test_add_step_and_display_output(self):
+        p = Pipeline()
+
+        def session():
+            p.add_instruction("ADD $t0 $t1 $t2")
+            p.add_instruction("SUB $t3 $t0 $t1")
+            p.step_pipeline()
+            p.step_pipeline()
+            p.display_pipeline()
+            p.step_pipeline()
+            p.add_instruction("OR $t4 $t3 $t3")
+            p.step_pipeline()
+            p.step_pipeline()
+            p.display_pipeline()
+            p.step_pipeline()
+            p.step_pipeline()
+            p.step_pipeline()
+            p.step_pipeline()
+            p.display_pipeline()
+            p.step_pipeline()
+
+        self.assertEqual(captured(session), [
+            "I1 (ADD $t0 $t1 $t2) added to instruction queue.", RULE,
+            "I2 (SUB $t3 $t0 $t1) added to instruction queue.", RULE,
+            "I1 fetched into IF stage.", RULE,
+            "I2 fetched into IF stage.", RULE,
+            *HEADER,
+            row("I1 (ADD $t0 $t1 $t2)", 1),
+            row("I2 (SUB $t3 $t0 $t1)", 0),
+            *FOOTER,
+            RULE,
+            "I3 (OR $t4 $t3 $t3) added to instruction queue.", RULE,
+            "I3 fetched into IF stage.", RULE,
+            "I1 has completed execution.", RULE,
+            *HEADER,
+            row("I2 (SUB $t3 $t0 $t1)", 3),
+            row("I3 (OR $t4 $t3 $t3)", 1),
+            *FOOTER,
+            "I2 has completed execution.", RULE,
+            RULE,
+            "I3 has completed execution.", RULE,
+            RULE,
+            *HEADER,
+            EMPTY,
+            *FOOTER,
+            RULE,
+            "",
+        ])
+        self.assertFalse(p.instructions)
+
+    def test_verbose_off_prints_nothing(self):
+        p = Pipeline()
+        with redirect_stdout(io.StringIO()):
+            p.add_instruction("ADD $t0 $t1 $t2")
+        p.verbose = False
+        self.assertEqual(captured(lambda: [p.step_pipeline() for _ in range(6)]), [""])
+        self.assertFalse(p.instructions)
+        self.assertFalse(p.log)
+
+    def test_menu_toggles_step_messages(self):
+        choices = ["1", "ADD $t0 $t1 $t2", "4", "2", "4", "2", "9", "5"]
+        with mock.patch("builtins.input", side_effect=choices):
+            lines = captured(pipeline.main)
+        self.assertEqual(lines.count("Step messages turned off."), 1)
+        self.assertEqual(lines.count("Step messages turned on."), 1)
+        self.assertNotIn("I1 fetched into IF stage.", lines)
+        self.assertIn("Invalid choice. Please try again.", lines)
+        self.assertEqual(lines[-2:], ["Exiting program.", ""])
+
+
+if __name__ == '__main__':
+    unittest.main()
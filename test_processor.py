@@ -0,0 +1,419 @@
+# Differential tests for the MIPS simulator.
+# The same programs run through every execution path (plain fetch/decode/execute
+# stepping, the trace interpreter, primed decode caches and compiled hot loops)
+# and must leave identical registers, memory and program counter.
+# InstructionTest pins known results for single instructions on every path.
+# Run with: python -m unittest test_processor   (or pytest)
+
+import ctypes
+import hashlib
+import io
+import random
+import struct
+import unittest
+from contextlib import redirect_stdout
+
+import processor
+from processor import CPU, Memory
+
+TEXT = 0x00400000
+
+
+def r_type(fn, rs=0, rt=0, rd=0, sh=0):
+    return (rs << 21) | (rt << 16) | (rd << 11) | (sh << 6) | fn
+
+
+def i_type(op, rs, rt, imm):
+    return (op << 26) | (rs << 21) | (rt << 16) | (imm & 0xFFFF)
+
+
+def j_type(op, address):
+    return (op << 26) | ((address >> 2) & 0x03FFFFFF)
+
+
+FACTORIAL = [0x20080005, 0x20090001, 0x11000004, 0x01280018, 0x00004812, 0x2108FFFF, 0x08100002]
+
+
+def random_program(rng):
+    """
+    Build a random loop mixing ALU ops, stack loads/stores, branches, jumps,
+    stores into its own code and out-of-bounds loads.
+    """
+    regs = [0, 8, 9, 10, 11, 12]
+    reg = lambda: rng.choice(regs)
+    n = rng.randint(3, 14)
+    words = [i_type(0x08, 0, 8, rng.randint(1, 40)), i_type(0x08, 0, 9, rng.randint(-5, 5))]
+    for k in range(2, n):
+        c = rng.random()
+        if c < 0.45:
+            fn = rng.choice([0x20, 0x22, 0x2A, 0x26, 0x25, 0x27, 0x24, 0x18, 0x1A, 0x12, 0x00, 0x3F])
+            words.append(r_type(fn, reg(), reg(), reg(), rng.randint(0, 31)))
+        elif c < 0.6:
+            words.append(i_type(0x08, reg(), reg(), rng.randint(-3, 3)))
+        elif c < 0.7:
+            words.append(i_type(0x23, 29, reg(), rng.choice([-8, -4, -2, 0])))
+        elif c < 0.78:
+            words.append(i_type(0x2B, 29, reg(), rng.choice([-8, -4, -2, 0])))
+        elif c < 0.82:
+            # Self-modifying store into the program itself, sometimes unaligned
+            words.append(i_type(0x2B, 0, reg(), rng.choice([0, 4 * rng.randint(0, n),
+                                                           4 * rng.randint(0, n) + 2])))
+        elif c < 0.9:
+            words.append(i_type(rng.choice([0x04, 0x05]), reg(), reg(), rng.randint(-k, n - k)))
+        elif c < 0.93:
+            words.append(i_type(0x23, 0, reg(), 0x1FFFFE))  # Faults
+        else:
+            words.append(j_type(0x02, TEXT + 4 * rng.randint(0, n - 1)))
+        if rng.random() < 0.1:
+            words.append(r_type(0x18, reg(), reg()))
+            words.append(r_type(0x12, rd=reg()))
+    words.append(i_type(0x08, 8, 8, -1))
+    words.append(i_type(0x05, 8, 0, -(len(words) - 1)))  # Loop back to the 2nd instruction
+    words.append(j_type(0x02, TEXT + 4))
+    return words
+
+
+def machine_state(cpu, error):
+    return (cpu.program_counter, cpu.registers.snapshot(),
+            hashlib.md5(bytes(cpu.memory.data)).hexdigest(), error)
+
+
+def run_stepping(words, chunks):
+    """Reference path: the plain fetch/decode/execute loop, one instruction at a time."""
+    cpu = CPU(Memory(), engine='interpreter')
+    cpu.memory.store_program(TEXT, words)
+    error = None
+    try:
+        for _ in range(sum(chunks)):
+            if not cpu.execute(cpu.decode(cpu.fetch())):
+                cpu.program_counter += 4
+    except IndexError as e:
+        error = type(e).__name__
+    return machine_state(cpu, error)
+
+
+def run_engine(words, chunks, engine, prime=False):
+    cpu = CPU(Memory(), engine=engine)
+    cpu.memory.store_program(TEXT, words)
+    if prime:
+        cpu.prime_decode_cache(TEXT, len(words))
+    error = None
+    try:
+        for cycles in chunks:
+            cpu.run(cycles)
+    except IndexError as e:
+        error = type(e).__name__
+    return machine_state(cpu, error)
+
+
+class DifferentialTest(unittest.TestCase):
+    def setUp(self):
+        self._threshold = processor.HOT_LOOP_THRESHOLD
+
+    def tearDown(self):
+        processor.HOT_LOOP_THRESHOLD = self._threshold
+
+    def test_random_programs_agree_across_engines(self):
+        for seed in range(120):
+            rng = random.Random(seed)
+            words = random_program(rng)
+            chunks = [rng.randint(1, 120) for _ in range(rng.randint(1, 5))]
+            expected = run_stepping(words, chunks)
+            for threshold in (1, 3, 50):
+                processor.HOT_LOOP_THRESHOLD = threshold
+                for engine in CPU.ENGINES:
+                    for prime in (False, True):
+                        with self.subTest(seed=seed, threshold=threshold, engine=engine, prime=prime):
+                            self.assertEqual(run_engine(words, chunks, engine, prime), expected)
+
+
+class ProcessorTest(unittest.TestCase):
+    def test_factorial(self):
+        for engine in CPU.ENGINES:
+            cpu = CPU(Memory(), engine=engine)
+            cpu.memory.store_program(TEXT, FACTORIAL)
+            cpu.run(60)
+            self.assertEqual(cpu.registers.read(9), 120)
+
+    def test_faulting_access_leaves_pc_on_it(self):
+        for engine in CPU.ENGINES:
+            for op in (0x23, 0x2B):
+                with self.subTest(engine=engine, op=op):
+                    cpu = CPU(Memory(), engine=engine)
+                    cpu.memory.store_program(TEXT, [0, i_type(op, 0, 8, 0x1FFFFE)])
+                    with self.assertRaises(IndexError):
+                        cpu.run(5)
+                    self.assertEqual(cpu.program_counter, TEXT + 4)
+
+    def test_fetch_past_end_raises_index_error(self):
+        for engine in CPU.ENGINES:
+            with self.subTest(engine=engine):
+                cpu = CPU(Memory(64), engine=engine)
+                with self.assertRaises(IndexError):
+                    cpu.run(100)
+                self.assertEqual(cpu.program_counter, TEXT + 64)
+
+    def test_invalidate_code_after_buffer_write(self):
+        for engine in CPU.ENGINES:
+            with self.subTest(engine=engine):
+                memory = Memory()
+                cpu = CPU(memory, engine=engine)
+                memory.store_program(TEXT, [i_type(0x08, 0, 8, 1), j_type(0x02, TEXT)])
+                cpu.run(2)
+                address, _ = memory.buffer_info()
+                patch = i_type(0x08, 0, 8, 7).to_bytes(4, 'big')
+                ctypes.memmove(address + (TEXT & processor.ADDRESS_MASK), patch, 4)
+                memory.invalidate_code()
+                cpu.run(2)
+                self.assertEqual(cpu.registers.read(8), 7)
+
+    def test_jit_compile_block_matches_interpreter(self):
+        expected = run_engine(FACTORIAL, [7, 13, 40], 'interpreter')
+        cpu = CPU(Memory())
+        cpu.memory.store_program(TEXT, FACTORIAL)
+        self.assertTrue(cpu.jit_compile_block(TEXT + 0x08, TEXT + 0x18))
+        for cycles in (7, 13, 40):
+            cpu.run(cycles)
+        self.assertEqual(machine_state(cpu, None), expected)
+        self.assertEqual(cpu.registers.read(9), 120)
+
+    def test_jit_compile_block_rejects_non_back_edge(self):
+        words = [i_type(0x08, 8, 8, 1), i_type(0x08, 9, 9, 1), j_type(0x02, TEXT)]
+        cpu = CPU(Memory())
+        cpu.memory.store_program(TEXT, words)
+        self.assertFalse(cpu.jit_compile_block(TEXT, TEXT + 4))
+        cpu.run(30)
+        self.assertEqual((cpu.registers.read(8), cpu.registers.read(9), cpu.program_counter),
+                         (10, 10, TEXT))
+
+    def test_negative_cycles_is_a_no_op(self):
+        for engine in CPU.ENGINES:
+            cpu = CPU(Memory(), engine=engine)
+            cpu.memory.store_program(TEXT, [i_type(0x08, 0, 8, 1)])
+            cpu.run_many(-1)
+            self.assertEqual((cpu.program_counter, cpu.registers.read(8)), (TEXT, 0))
+
+    def test_reset_clears_state_in_place(self):
+        words = [i_type(0x08, 8, 8, 1), r_type(0x18, 8, 8), r_type(0x12, rd=9),
+                 i_type(0x2B, 29, 9, -4), j_type(0x02, TEXT)]
+        for engine in CPU.ENGINES:
+            with self.subTest(engine=engine):
+                memory = Memory()
+                cpu = CPU(memory, engine=engine)
+                memory.store_program(TEXT, words)
+                cpu.run(503)  # Long enough for the jit engine to compile the loop
+                self.assertNotEqual(cpu.registers.read(32), 0)
+                with redirect_stdout(io.StringIO()):
+                    self.assertIs(cpu.reset(), cpu)
+                self.assertIs(cpu.memory, memory)
+                self.assertEqual(cpu.engine, engine)
+                self.assertEqual(cpu.program_counter, TEXT)
+                self.assertEqual(cpu.registers.snapshot(), (0,) * 29 + (0x100000,) + (0,) * 3)
+                self.assertEqual(bytes(memory.data), bytes(len(memory.data)))
+                # Written behind the code-cache tracking, so only a cleared cache runs it
+                address, _ = memory.buffer_info()
+                program = struct.pack('>2I', i_type(0x08, 0, 10, 5), j_type(0x02, TEXT))
+                ctypes.memmove(address + (TEXT & processor.ADDRESS_MASK), program, len(program))
+                cpu.run(100)
+                self.assertEqual((cpu.registers.read(8), cpu.registers.read(10)), (0, 5))
+
+    def test_decoded_words_stay_bounded(self):
+        # Each iteration stores "addi $9, $0, counter" into the word it runs next
+        words = [i_type(0x08, 0, 10, 0x2009), r_type(0x00, rt=10, rd=10, sh=16),
+                 i_type(0x08, 0, 12, 0x40), r_type(0x00, rt=12, rd=12, sh=16),
+                 r_type(0x20, 10, 8, 11), i_type(0x2B, 12, 11, 24), 0,
+                 i_type(0x08, 8, 8, 1), j_type(0x02, TEXT + 16)]
+        limit = processor.MAX_DECODED_WORDS
+        processor.MAX_DECODED_WORDS = 16
+        try:
+            for engine in CPU.ENGINES:
+                with self.subTest(engine=engine):
+                    cpu = CPU(Memory(), engine=engine)
+                    cpu.memory.store_program(TEXT, words)
+                    cpu.run(4 + 5 * 200)
+                    self.assertEqual((cpu.registers.read(8), cpu.registers.read(9)), (200, 199))
+                    self.assertLessEqual(len(cpu._decoded_words), 16)
+                    with redirect_stdout(io.StringIO()):
+                        cpu.reset()
+                    self.assertFalse(cpu._decoded_words)
+        finally:
+            processor.MAX_DECODED_WORDS = limit
+
+
+
+class ProgramLoaderTest(unittest.TestCase):
+    def test_load_program_bytes_runs_like_store_program(self):
+        for engine in CPU.ENGINES:
+            with self.subTest(engine=engine):
+                stored = CPU(Memory(), engine=engine)
+                stored.memory.store_program(TEXT, FACTORIAL)
+                loaded = CPU(Memory(), engine=engine)
+                loaded.memory.load_program_bytes(TEXT, struct.pack('>7I', *FACTORIAL))
+                for cpu in (stored, loaded):
+                    cpu.run(60)
+                self.assertEqual(machine_state(loaded, None), machine_state(stored, None))
+                self.assertEqual(loaded.registers.read(9), 120)
+
+    def test_load_program_bytes_rejects_partial_words(self):
+        memory = Memory(64)
+        with self.assertRaises(ValueError):
+            memory.load_program_bytes(0, b'\x00' * 6)
+        self.assertEqual(bytes(memory.data), bytes(64))
+
+    def test_loaders_store_word_by_word_off_the_end(self):
+        image = struct.pack('>3I', 1, 2, 3)
+        for load in (lambda m, a: m.load_program_bytes(a, image),
+                     lambda m, a: m.store_program(a, [1, 2, 3])):
+            # Past the end of a small memory the words that fit are stored, then it raises
+            memory = Memory(64)
+            with self.assertRaises(IndexError):
+                load(memory, 56)
+            self.assertEqual(bytes(memory.data[56:]), struct.pack('>2I', 1, 2))
+            # Past the address mask the last word wraps around to address 0
+            memory = Memory()
+            load(memory, processor.ADDRESS_MASK - 7)
+            self.assertEqual(bytes(memory.data[-8:]), struct.pack('>2I', 1, 2))
+            self.assertEqual(bytes(memory.data[:4]), struct.pack('>I', 3))
+
+    def test_load_program_bytes_invalidates_overlapped_code(self):
+        words = [i_type(0x08, 0, 8, 1), j_type(0x02, TEXT)]
+        patches = [
+            (TEXT, struct.pack('>I', i_type(0x08, 0, 8, 7)), 7),
+            # Unaligned: the low half of the addi and the high half of the j
+            (TEXT + 2, struct.pack('>2H', 9, words[1] >> 16), 9),
+        ]
+        for engine in CPU.ENGINES:
+            for address, image, expected in patches:
+                with self.subTest(engine=engine, address=address):
+                    cpu = CPU(Memory(), engine=engine)
+                    cpu.memory.store_program(TEXT, words)
+                    cpu.run(4)
+                    cpu.memory.load_program_bytes(address, image)
+                    cpu.run(2)
+                    self.assertEqual(cpu.registers.read(8), expected)
+
+
+def run_paths(words, cycles, pc=TEXT):
+    """
+    Run a program by plain stepping and on every engine, yielding (path, cpu)
+    for each. Golden results are checked on all of them, so a regression
+    shared by every path still fails.
+    """
+    for path in ('stepping',) + CPU.ENGINES:
+        cpu = CPU(Memory(), engine='interpreter' if path == 'stepping' else path)
+        cpu.memory.store_program(pc, words)
+        cpu.program_counter = pc
+        if path == 'stepping':
+            for _ in range(cycles):
+                if not cpu.execute(cpu.decode(cpu.fetch())):
+                    cpu.program_counter += 4
+        else:
+            cpu.run(cycles)
+        yield path, cpu
+
+
+class InstructionTest(unittest.TestCase):
+    """Known results for individual instructions, independent of the execution path."""
+
+    def assertRegisters(self, words, cycles, expected, pc=TEXT):
+        for path, cpu in run_paths(words, cycles, pc):
+            with self.subTest(path=path):
+                self.assertEqual({r: cpu.registers.read(r) for r in expected}, expected)
+
+    def assertPC(self, words, cycles, expected, pc=TEXT):
+        for path, cpu in run_paths(words, cycles, pc):
+            with self.subTest(path=path):
+                self.assertEqual(cpu.program_counter, expected)
+
+    def test_beq_target_is_relative_to_the_branch(self):
+        words = [0, i_type(0x04, 0, 0, 3)]  # beq at TEXT + 4
+        self.assertPC(words, 2, TEXT + 4 + 3 * 4)
+
+    def test_beq_not_taken_falls_through(self):
+        words = [i_type(0x08, 0, 8, 1), i_type(0x04, 8, 0, 3)]
+        self.assertPC(words, 2, TEXT + 8)
+
+    def test_bne_backwards_target_is_relative_to_the_branch(self):
+        words = [0, i_type(0x08, 0, 8, 1), i_type(0x05, 8, 0, -2)]  # bne at TEXT + 8
+        self.assertPC(words, 3, TEXT)
+
+    def test_jal_links_the_next_instruction(self):
+        words = [0, 0, j_type(0x03, TEXT + 0x40)]  # jal at TEXT + 8
+        for path, cpu in run_paths(words, 3):
+            with self.subTest(path=path):
+                self.assertEqual(cpu.program_counter, TEXT + 0x40)
+                self.assertEqual(cpu.registers.read(31), TEXT + 12)
+
+    def test_jr_returns_to_the_link(self):
+        words = [j_type(0x03, TEXT + 0x40), i_type(0x08, 0, 8, 9)] + [0] * 14 + [r_type(0x08, rs=31)]
+        self.assertRegisters(words, 4, {8: 9, 31: TEXT + 4})
+
+    def assertExecuteJumps(self, words, steps, target):
+        cpu = CPU(Memory(), engine='interpreter')
+        cpu.memory.store_program(TEXT, words)
+        for _ in range(steps - 1):
+            if not cpu.execute(cpu.decode(cpu.fetch())):
+                cpu.program_counter += 4
+        self.assertTrue(cpu.execute(cpu.decode(cpu.fetch())))
+        self.assertEqual(cpu.program_counter, target)
+
+    def test_execute_reports_taken_branch_to_next_instruction(self):
+        self.assertExecuteJumps([i_type(0x04, 0, 0, 1)], 1, TEXT + 4)
+
+    def test_execute_reports_jump_to_next_instruction(self):
+        self.assertExecuteJumps([j_type(0x02, TEXT + 4)], 1, TEXT + 4)
+
+    def test_execute_reports_jr_and_jal_to_next_instruction(self):
+        self.assertExecuteJumps([j_type(0x03, TEXT + 4)], 1, TEXT + 4)
+        # $ra = TEXT + 4 + 8 points just past the jr at TEXT + 8
+        words = [j_type(0x03, TEXT + 4), i_type(0x08, 31, 31, 8), r_type(0x08, rs=31)]
+        self.assertExecuteJumps(words, 3, TEXT + 12)
+
+    def test_j_keeps_the_upper_pc_bits(self):
+        # 0x10400000 maps onto the same memory as TEXT, but its PC[31:28] is 1
+        self.assertPC([j_type(0x02, TEXT + 0x10)], 1, 0x10400010, pc=0x10400000)
+
+    def test_sll(self):
+        words = [i_type(0x08, 0, 8, -1), r_type(0x00, rt=8, rd=9, sh=4), r_type(0x00, rt=8, rd=10)]
+        self.assertRegisters(words, 3, {9: 0xFFFFFFF0, 10: 0xFFFFFFFF})
+
+    def test_nor(self):
+        words = [i_type(0x08, 0, 8, 0x0F0F), r_type(0x27, 8, 0, 9), r_type(0x27, 0, 0, 10)]
+        self.assertRegisters(words, 3, {9: 0xFFFFF0F0, 10: 0xFFFFFFFF})
+
+    def test_slt_compares_register_values_unsigned(self):
+        words = [i_type(0x08, 0, 8, -1), i_type(0x08, 0, 9, 1),
+                 r_type(0x2A, 9, 8, 10), r_type(0x2A, 8, 9, 11), r_type(0x2A, 9, 9, 12)]
+        self.assertRegisters(words, 5, {10: 1, 11: 0, 12: 0})
+
+    def test_div_quotient_goes_to_lo(self):
+        words = [i_type(0x08, 0, 8, 17), i_type(0x08, 0, 9, 5),
+                 r_type(0x1A, 8, 9), r_type(0x12, rd=10),
+                 r_type(0x1A, 8, 0), r_type(0x12, rd=11)]  # Division by zero leaves lo alone
+        self.assertRegisters(words, 6, {10: 3, 11: 3, 32: 3})
+
+    def test_mult_low_word_goes_to_lo(self):
+        words = [i_type(0x08, 0, 8, -2), i_type(0x08, 0, 9, 3),
+                 r_type(0x18, 8, 9), r_type(0x12, rd=10)]
+        self.assertRegisters(words, 4, {10: 0xFFFFFFFA, 32: 0xFFFFFFFA})
+
+    def test_writes_to_zero_are_dropped(self):
+        words = [i_type(0x08, 0, 8, 6), i_type(0x08, 0, 0, 5), r_type(0x20, 8, 8, 0),
+                 r_type(0x00, rt=8, rd=0, sh=1), r_type(0x18, 8, 8), r_type(0x12, rd=0),
+                 i_type(0x2B, 29, 8, 0), i_type(0x23, 29, 0, 0)]
+        self.assertRegisters(words, 8, {0: 0, 8: 6, 32: 36})
+
+    def test_faulting_lw_and_sw_leave_pc_on_themselves(self):
+        for op in (0x23, 0x2B):
+            words = [0, i_type(op, 0, 8, -2)]  # Address 0x1FFFFE is past the last word
+            cpu = CPU(Memory(), engine='interpreter')
+            cpu.memory.store_program(TEXT, words)
+            self.assertFalse(cpu.execute(cpu.decode(cpu.fetch())))
+            cpu.program_counter += 4
+            with self.subTest(op=op), self.assertRaises(IndexError):
+                cpu.execute(cpu.decode(cpu.fetch()))
+            self.assertEqual(cpu.program_counter, TEXT + 4)
+
+
+if __name__ == '__main__':
+    unittest.main()